@@ -1,30 +1,44 @@
+from operator import attrgetter
+
 from rest_framework import permissions
 
+from core.models import Export, Order, Product, ProductUpload, Profile
+from core.utils import get_feature_flags, get_profile
+
+# Maps each model to the accessor resolving its owning company, replacing
+# a chain of hasattr probes per object check.
+_OWNER_COMPANY_GETTERS = {
+    Product: attrgetter('company'),
+    Order: attrgetter('product.company'),
+    Export: attrgetter('requested_by.company'),
+    ProductUpload: attrgetter('company'),
+    Profile: attrgetter('company'),
+}
+
+# Maps a view's feature_name to the matching CompanyFeatureToggle flag.
+_FEATURE_GETTERS = {
+    'bulk_orders': attrgetter('bulk_orders_enabled'),
+    'exports': attrgetter('exports_enabled'),
+    'api_access': attrgetter('api_access_enabled'),
+    'csv_upload': attrgetter('csv_upload_enabled'),
+}
 
 class IsCompanyMember(permissions.BasePermission):
     """
     Ensures user accesses only their company's data.
     """
     def has_permission(self, request, view):
-        return hasattr(request.user, 'profile') and not request.user.profile.is_blocked
+        profile = get_profile(request)
+        return profile is not None and not profile.is_blocked
 
     def has_object_permission(self, request, view, obj):
-        if not hasattr(request.user, 'profile'):
+        profile = get_profile(request)
+        if profile is None:
             return False
-        
-        user_company = request.user.profile.company
-        
+
         # Check based on object type
-        if hasattr(obj, 'company'):
-            return obj.company == user_company
-        elif hasattr(obj, 'product'):
-            return obj.product.company == user_company
-        elif hasattr(obj, 'created_by'):
-            return obj.created_by.company == user_company
-        elif hasattr(obj, 'requested_by'):
-            return obj.requested_by.company == user_company
-        
-        return False
+        accessor = _OWNER_COMPANY_GETTERS.get(type(obj))
+        return accessor is not None and accessor(obj) == profile.company
 
 
 class IsOperator(permissions.BasePermission):
@@ -32,9 +46,10 @@ class IsOperator(permissions.BasePermission):
     Checks if user has operator role.
     """
     def has_permission(self, request, view):
-        if not hasattr(request.user, 'profile'):
+        profile = get_profile(request)
+        if profile is None:
             return False
-        return request.user.profile.role in ['operator', 'admin'] and not request.user.profile.is_blocked
+        return profile.role in ['operator', 'admin'] and not profile.is_blocked
 
 
 class IsViewer(permissions.BasePermission):
@@ -42,13 +57,14 @@ class IsViewer(permissions.BasePermission):
     Checks if user has viewer role (read-only access).
     """
     def has_permission(self, request, view):
-        if not hasattr(request.user, 'profile'):
+        profile = get_profile(request)
+        if profile is None:
             return False
-        
+
         # Viewers can only perform safe methods (GET, HEAD, OPTIONS)
         if request.method in permissions.SAFE_METHODS:
-            return not request.user.profile.is_blocked
-        
+            return not profile.is_blocked
+
         return False
 
 
@@ -57,9 +73,10 @@ class IsAdmin(permissions.BasePermission):
     Checks if user has admin role.
     """
     def has_permission(self, request, view):
-        if not hasattr(request.user, 'profile'):
+        profile = get_profile(request)
+        if profile is None:
             return False
-        return request.user.profile.role == 'admin' and not request.user.profile.is_blocked
+        return profile.role == 'admin' and not profile.is_blocked
 
 
 class HasFeatureEnabled(permissions.BasePermission):
@@ -68,32 +85,16 @@ class HasFeatureEnabled(permissions.BasePermission):
     Usage: Set feature_name attribute on the view.
     """
     message = "This feature is disabled for your company."
-    
+
     def has_permission(self, request, view):
-        if not hasattr(request.user, 'profile'):
+        profile = get_profile(request)
+        if profile is None:
             return False
-        
-        company = request.user.profile.company
-        
-        # Get feature toggle, create if doesn't exist
-        if not hasattr(company, 'feature_toggle'):
-            from core.models import CompanyFeatureToggle
-            CompanyFeatureToggle.objects.create(company=company)
-            company.refresh_from_db()
-        
-        feature_toggle = company.feature_toggle
-        
+
         # Check specific feature based on view's feature_name attribute
-        feature_name = getattr(view, 'feature_name', None)
-        
-        if feature_name == 'bulk_orders':
-            return feature_toggle.bulk_orders_enabled
-        elif feature_name == 'exports':
-            return feature_toggle.exports_enabled
-        elif feature_name == 'api_access':
-            return feature_toggle.api_access_enabled
-        elif feature_name == 'csv_upload':
-            return feature_toggle.csv_upload_enabled
-        
+        getter = _FEATURE_GETTERS.get(getattr(view, 'feature_name', None))
+
         # Default to True if no specific feature specified
-        return True
+        if getter is None:
+            return True
+        return getter(get_feature_flags(profile.company_id))
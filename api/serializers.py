@@ -1,10 +1,32 @@
 from rest_framework import serializers
 from core.models import Product, Order, Export, Profile
 from django.contrib.auth.models import User
-import uuid
+from django.db import transaction
+from core.utils import get_profile
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class DynamicFieldsMixin:
+    """
+    Lets clients request a subset of fields via ?fields=a,b,c.
+    Unrequested fields are dropped before serialization.
+
+    Only applied on read requests: pruning on writes would silently drop
+    required input fields and let invalid payloads through validation.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None or request.method not in ('GET', 'HEAD', 'OPTIONS'):
+            return
+        fields_param = request.query_params.get('fields')
+        if not fields_param:
+            return
+        allowed = {field.strip() for field in fields_param.split(',')}
+        for field_name in set(self.fields) - allowed:
+            self.fields.pop(field_name)
+
+
+class ProductSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     company_name = serializers.CharField(source='company.name', read_only=True)
 
     class Meta:
@@ -13,7 +35,7 @@ class ProductSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'company']
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     product_name = serializers.CharField(source='product.name', read_only=True)
     product_sku = serializers.CharField(source='product.sku', read_only=True)
     created_by_username = serializers.CharField(source='created_by.user.username', read_only=True)
@@ -28,17 +50,16 @@ class OrderSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'reference_code', 'status', 'created_by', 'has_been_processed', 'created_at', 'updated_at']
 
     def create(self, validated_data):
-        # Auto-generate reference code
-        validated_data['reference_code'] = f"ORD-{uuid.uuid4().hex[:8].upper()}"
+        # reference_code comes from the model default
         # Set created_by from request context
-        validated_data['created_by'] = self.context['request'].user.profile
+        validated_data['created_by'] = get_profile(self.context['request'])
         return super().create(validated_data)
 
     def validate_product(self, value):
         """Ensure product belongs to user's company."""
-        user = self.context['request'].user
-        if hasattr(user, 'profile'):
-            if value.company != user.profile.company:
+        profile = get_profile(self.context['request'])
+        if profile is not None:
+            if value.company_id != profile.company_id:
                 raise serializers.ValidationError("Product does not belong to your company.")
         return value
 
@@ -49,15 +70,17 @@ class BulkOrderSerializer(serializers.Serializer):
 
     def create(self, validated_data):
         orders_data = validated_data['orders']
-        created_orders = []
-        for order_data in orders_data:
-            order_data['reference_code'] = f"ORD-{uuid.uuid4().hex[:8].upper()}"
-            order_data['created_by'] = self.context['request'].user.profile
-            created_orders.append(Order.objects.create(**order_data))
-        return created_orders
+        profile = get_profile(self.context['request'])
+        # reference_code comes from the model default
+        orders = [
+            Order(created_by=profile, **order_data)
+            for order_data in orders_data
+        ]
+        with transaction.atomic():
+            return Order.objects.bulk_create(orders, batch_size=500)
 
 
-class ExportSerializer(serializers.ModelSerializer):
+class ExportSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     requested_by_username = serializers.CharField(source='requested_by.user.username', read_only=True)
     file_url = serializers.SerializerMethodField()
 
@@ -72,6 +72,16 @@ class APIPermissionTest(TestCase):
         self.assertIn('reference_code', response.data)
         self.assertEqual(response.data['quantity'], 5)
 
+    def test_create_order_ignores_fields_param(self):
+        """Test that ?fields= does not drop required fields on writes."""
+        self.client.force_authenticate(user=self.operator1)
+        response = self.client.post('/api/orders/?fields=id', {}, format='json')
+
+        # Validation must still require product/quantity
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('product', response.data)
+        self.assertIn('quantity', response.data)
+
     def test_blocked_user_cannot_access_api(self):
         """Test that blocked users cannot access API."""
         self.operator1_profile.is_blocked = True
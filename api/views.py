@@ -1,3 +1,6 @@
+import os
+
+from celery import group
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
@@ -7,13 +10,26 @@ from core.models import Product, Order, Export
 from .serializers import ProductSerializer, OrderSerializer, BulkOrderSerializer, ExportSerializer
 from .permissions import IsCompanyMember, IsOperator, HasFeatureEnabled
 from .throttling import ProductsThrottle, OrdersThrottle, ExportsThrottle
-from core.tasks import process_order
+from core.utils import get_profile
+from core.tasks import process_order, process_orders
 import logging
 
 logger = logging.getLogger(__name__)
 
 
-class ProductViewSet(viewsets.ReadOnlyModelViewSet):
+class RequestedFieldsMixin:
+    """
+    Parses the ?fields= query param understood by DynamicFieldsMixin
+    serializers, so get_queryset can skip joins the response won't use.
+    """
+    def get_requested_fields(self):
+        fields_param = self.request.query_params.get('fields')
+        if not fields_param:
+            return None
+        return {field.strip() for field in fields_param.split(',')}
+
+
+class ProductViewSet(RequestedFieldsMixin, viewsets.ReadOnlyModelViewSet):
     """
     API endpoint for viewing products.
     """
@@ -23,15 +39,27 @@ class ProductViewSet(viewsets.ReadOnlyModelViewSet):
 
     def get_queryset(self):
         """Filter products by user's company."""
-        if hasattr(self.request.user, 'profile'):
-            return Product.objects.filter(
-                company=self.request.user.profile.company,
-                is_active=True
+        profile = get_profile(self.request)
+        if profile is None:
+            return Product.objects.none()
+
+        queryset = Product.objects.filter(
+            company=profile.company,
+            is_active=True
+        )
+
+        requested = self.get_requested_fields()
+        if requested is None:
+            return queryset.select_related('company').only(
+                'id', 'sku', 'name', 'stock_quantity', 'company', 'is_active',
+                'created_at', 'company__name'
             )
-        return Product.objects.none()
+        if 'company_name' in requested:
+            queryset = queryset.select_related('company')
+        return queryset
 
 
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(RequestedFieldsMixin, viewsets.ModelViewSet):
     """
     API endpoint for managing orders.
     """
@@ -45,18 +73,40 @@ class OrderViewSet(viewsets.ModelViewSet):
         - Admins see all company orders
         - Operators see only their own orders
         """
-        if not hasattr(self.request.user, 'profile'):
+        profile = get_profile(self.request)
+        if profile is None:
             return Order.objects.none()
 
-        profile = self.request.user.profile
-        
+        requested = self.get_requested_fields()
+        if requested is None:
+            queryset = Order.objects.select_related('product', 'created_by__user').only(
+                'id', 'reference_code', 'product', 'quantity', 'status', 'created_by',
+                'has_been_processed', 'created_at', 'updated_at',
+                'product__name', 'product__sku', 'product__company',
+                'created_by__user__username'
+            )
+        else:
+            # Clear the manager's default joins so only the relations the
+            # requested fields actually render get selected back in
+            queryset = Order.objects.select_related(None)
+            if requested & {'product_name', 'product_sku'}:
+                queryset = queryset.select_related('product')
+            if 'created_by_username' in requested:
+                queryset = queryset.select_related('created_by__user')
+
         if profile.role == 'admin':
-            return Order.objects.filter(product__company=profile.company)
+            return queryset.filter(product__company=profile.company)
         elif profile.role == 'operator':
-            return Order.objects.filter(created_by=profile)
-        
+            return queryset.filter(created_by=profile)
+
         return Order.objects.none()
 
+    def get_permissions(self):
+        """Expose feature_name before check_permissions runs."""
+        if self.action == 'bulk_create':
+            self.feature_name = 'bulk_orders'
+        return super().get_permissions()
+
     def perform_create(self, serializer):
         """Create order and trigger processing task."""
         order = serializer.save()
@@ -70,29 +120,34 @@ class OrderViewSet(viewsets.ModelViewSet):
         Bulk create orders.
         POST /api/orders/bulk/
         Body: {"orders": [{"product": 1, "quantity": 10}, ...]}
+
+        The bulk_orders feature toggle is enforced by HasFeatureEnabled.
         """
-        # Set feature name for HasFeatureEnabled permission
-        self.feature_name = 'bulk_orders'
-        
-        # Check feature toggle
-        if hasattr(request.user, 'profile'):
-            company = request.user.profile.company
-            if hasattr(company, 'feature_toggle') and not company.feature_toggle.bulk_orders_enabled:
-                return Response(
-                    {'error': 'Bulk orders are disabled for your company'},
-                    status=status.HTTP_403_FORBIDDEN
-                )
-        
         serializer = BulkOrderSerializer(data=request.data, context={'request': request})
         if serializer.is_valid():
             orders = serializer.save()
-            # Trigger processing for each order
-            for order in orders:
-                process_order.delay(order.id)
-            
+            # Process in batches of 100 per task so broker and DB costs
+            # are amortized across the batch
+            order_ids = [order.id for order in orders]
+            group(
+                process_orders.s(order_ids[start:start + 100])
+                for start in range(0, len(order_ids), 100)
+            ).apply_async()
+
             logger.info(f"Bulk created {len(orders)} orders")
+            # Re-fetch with the serializer's relations joined so the
+            # response serialization costs one query, not one per order;
+            # re-ordered to match the request payload, since callers map
+            # results to inputs positionally
+            by_pk = {
+                order.pk: order
+                for order in Order.objects.select_related('product', 'created_by__user').filter(
+                    pk__in=order_ids
+                )
+            }
+            created = [by_pk[order_id] for order_id in order_ids]
             return Response(
-                OrderSerializer(orders, many=True, context={'request': request}).data,
+                OrderSerializer(created, many=True, context={'request': request}).data,
                 status=status.HTTP_201_CREATED
             )
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -117,10 +172,10 @@ class OrderViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Reset order status
+        # Reset order status; only write the columns that changed
         order.status = 'pending'
         order.has_been_processed = False
-        order.save()
+        order.save(update_fields=['status', 'has_been_processed', 'updated_at'])
         
         # Trigger processing
         process_order.delay(order.id)
@@ -133,7 +188,7 @@ class OrderViewSet(viewsets.ModelViewSet):
         )
 
 
-class ExportViewSet(viewsets.ReadOnlyModelViewSet):
+class ExportViewSet(RequestedFieldsMixin, viewsets.ReadOnlyModelViewSet):
     """
     API endpoint for viewing and downloading exports.
     """
@@ -143,27 +198,44 @@ class ExportViewSet(viewsets.ReadOnlyModelViewSet):
 
     def get_queryset(self):
         """Filter exports by user's company."""
-        if hasattr(self.request.user, 'profile'):
-            return Export.objects.filter(requested_by__company=self.request.user.profile.company)
-        return Export.objects.none()
+        profile = get_profile(self.request)
+        if profile is None:
+            return Export.objects.none()
+
+        queryset = Export.objects.filter(
+            requested_by__company=profile.company
+        )
+
+        requested = self.get_requested_fields()
+        if requested is None:
+            return queryset.select_related('requested_by__user').only(
+                'id', 'requested_by', 'status', 'file', 'note', 'created_at',
+                'requested_by__company', 'requested_by__user__username'
+            )
+        # Clear the manager's default joins so only the relations the
+        # requested fields actually render get selected back in
+        queryset = queryset.select_related(None)
+        if 'requested_by_username' in requested:
+            queryset = queryset.select_related('requested_by__user')
+        return queryset
 
-    @action(detail=True, methods=['get'], url_path='download')
+    def get_permissions(self):
+        """Expose feature_name before check_permissions runs."""
+        if self.action == 'download':
+            self.feature_name = 'exports'
+        return super().get_permissions()
+
+    @action(detail=True, methods=['get'], url_path='download',
+            permission_classes=[IsAuthenticated, IsCompanyMember, HasFeatureEnabled])
     def download(self, request, pk=None):
         """
         Download export file.
         GET /api/exports/<id>/download/
+
+        The exports feature toggle is enforced by HasFeatureEnabled.
         """
         export = self.get_object()
-        
-        # Check feature toggle
-        if hasattr(request.user, 'profile'):
-            company = request.user.profile.company
-            if hasattr(company, 'feature_toggle') and not company.feature_toggle.exports_enabled:
-                return Response(
-                    {'error': 'Exports are disabled for your company'},
-                    status=status.HTTP_403_FORBIDDEN
-                )
-        
+
         if export.status != 'ready':
             return Response(
                 {'error': f'Export is not ready. Current status: {export.status}'},
@@ -177,8 +249,14 @@ class ExportViewSet(viewsets.ReadOnlyModelViewSet):
             )
         
         try:
-            response = FileResponse(export.file.open('rb'), content_type='text/csv')
-            response['Content-Disposition'] = f'attachment; filename="export_{export.id}.csv"'
+            response = FileResponse(
+                export.file.open('rb'),
+                as_attachment=True,
+                filename=os.path.basename(export.file.name)
+            )
+            # 1MB reads instead of the default 4KB; with a server that
+            # supports wsgi.file_wrapper the copy is offloaded entirely
+            response.block_size = 1024 * 1024
             logger.info(f"Export {export.id} downloaded by {request.user.username}")
             return response
         except Exception as e:
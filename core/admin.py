@@ -1,10 +1,12 @@
+from celery import group
 from django.contrib import admin
 from django.contrib.auth.models import User
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from django.db.models import Count, Q
+from django.db.models import Q
 from django.utils.html import format_html
 from .models import Company, Profile, Product, Order, Export, CompanyFeatureToggle, ProductUpload
-from .tasks import process_order, generate_export, process_product_upload
+from .tasks import process_orders, generate_export, process_product_upload
+from .utils import get_feature_flags, get_profile
 
 
 # Inline for Profile in User admin
@@ -20,12 +22,18 @@ class UserAdmin(BaseUserAdmin):
     inlines = (ProfileInline,)
     list_display = ('username', 'email', 'first_name', 'last_name', 'is_staff', 'get_company', 'get_role')
 
+    def get_queryset(self, request):
+        """Join the profile/company the list columns read per row."""
+        return super().get_queryset(request).select_related('profile__company')
+
     def get_company(self, obj):
-        return obj.profile.company.name if hasattr(obj, 'profile') else '-'
+        profile = getattr(obj, 'profile', None)
+        return profile.company.name if profile else '-'
     get_company.short_description = 'Company'
 
     def get_role(self, obj):
-        return obj.profile.get_role_display() if hasattr(obj, 'profile') else '-'
+        profile = getattr(obj, 'profile', None)
+        return profile.get_role_display() if profile else '-'
     get_role.short_description = 'Role'
 
 
@@ -43,7 +51,8 @@ class CompanyAdmin(admin.ModelAdmin):
 
     def has_module_permission(self, request):
         """Hide Company model from operators."""
-        if hasattr(request.user, 'profile') and request.user.profile.role == 'operator':
+        profile = get_profile(request)
+        if profile is not None and profile.role == 'operator':
             return False
         return super().has_module_permission(request)
 
@@ -51,6 +60,7 @@ class CompanyAdmin(admin.ModelAdmin):
 @admin.register(Profile)
 class ProfileAdmin(admin.ModelAdmin):
     list_display = ('user', 'company', 'role', 'is_blocked', 'created_at')
+    list_select_related = ('user', 'company')
     list_filter = ('role', 'is_blocked', 'company')
     search_fields = ('user__username', 'user__email', 'company__name')
     readonly_fields = ('created_at', 'updated_at')
@@ -58,7 +68,8 @@ class ProfileAdmin(admin.ModelAdmin):
 
     def has_module_permission(self, request):
         """Hide Profile model from operators."""
-        if hasattr(request.user, 'profile') and request.user.profile.role == 'operator':
+        profile = get_profile(request)
+        if profile is not None and profile.role == 'operator':
             return False
         return super().has_module_permission(request)
 
@@ -67,24 +78,22 @@ class ProfileAdmin(admin.ModelAdmin):
         qs = super().get_queryset(request)
         if request.user.is_superuser:
             return qs
-        if hasattr(request.user, 'profile'):
-            return qs.filter(company=request.user.profile.company)
+        profile = get_profile(request)
+        if profile is not None:
+            return qs.filter(company=profile.company)
         return qs.none()
 
     def deactivate_profiles_with_failed_orders(self, request, queryset):
         """Deactivate profiles with 3 or more failed orders."""
-        for profile in queryset:
-            failed_count = profile.orders.filter(status='failed').count()
-            if failed_count >= 3:
-                profile.is_blocked = True
-                profile.save()
-        self.message_user(request, f"Profiles with 3+ failed orders have been blocked.")
+        updated = queryset.filter(failed_orders_count__gte=3).update(is_blocked=True)
+        self.message_user(request, f"{updated} profiles with 3+ failed orders have been blocked.")
     deactivate_profiles_with_failed_orders.short_description = "Block profiles with 3+ failed orders"
 
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
     list_display = ('sku', 'name', 'stock_quantity', 'company', 'is_active', 'created_at')
+    list_select_related = ('company',)
     list_filter = ('is_active', 'company', 'created_at')
     search_fields = ('sku', 'name')
     readonly_fields = ('created_at', 'updated_at')
@@ -94,19 +103,28 @@ class ProductAdmin(admin.ModelAdmin):
         qs = super().get_queryset(request)
         if request.user.is_superuser:
             return qs
-        if hasattr(request.user, 'profile'):
-            return qs.filter(company=request.user.profile.company)
+        profile = get_profile(request)
+        if profile is not None:
+            return qs.filter(company=profile.company)
         return qs.none()
 
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
     list_display = ('reference_code', 'product', 'quantity', 'status', 'created_by', 'has_been_processed', 'created_at')
+    list_select_related = ('product', 'product__company', 'created_by', 'created_by__user')
     list_filter = ('status', 'has_been_processed', 'product__company', 'created_at')
     search_fields = ('reference_code', 'product__name', 'created_by__user__username')
     readonly_fields = ('created_at', 'updated_at')
     actions = ['export_selected_orders', 'approve_orders', 'retry_failed_orders']
 
+    # Maps profile role to the visibility filter it gets; roles without an
+    # entry (viewer) see nothing in the order changelist.
+    _qs_filters = {
+        'admin': lambda profile: Q(product__company=profile.company),
+        'operator': lambda profile: Q(created_by=profile),
+    }
+
     def get_queryset(self, request):
         """
         Filter orders:
@@ -117,31 +135,30 @@ class OrderAdmin(admin.ModelAdmin):
         qs = super().get_queryset(request)
         if request.user.is_superuser:
             return qs
-        if hasattr(request.user, 'profile'):
-            profile = request.user.profile
-            if profile.role == 'admin':
-                return qs.filter(product__company=profile.company)
-            elif profile.role == 'operator':
-                return qs.filter(created_by=profile)
+        profile = get_profile(request)
+        if profile is not None:
+            role_filter = self._qs_filters.get(profile.role)
+            if role_filter is not None:
+                return qs.filter(role_filter(profile))
         return qs.none()
 
     def export_selected_orders(self, request, queryset):
         """Export selected orders to CSV via Celery task."""
-        if not hasattr(request.user, 'profile'):
+        profile = get_profile(request)
+        if profile is None:
             self.message_user(request, "You must have a profile to export orders.", level='error')
             return
 
-        # Create Export record
+        # Create Export record carrying the selection, so the broker
+        # message stays a single id regardless of how many orders were picked
         export = Export.objects.create(
-            requested_by=request.user.profile,
-            status='pending'
+            requested_by=profile,
+            status='pending',
+            order_ids=list(queryset.values_list('id', flat=True))
         )
 
-        # Get order IDs
-        order_ids = list(queryset.values_list('id', flat=True))
-
         # Trigger Celery task
-        generate_export.delay(export.id, order_ids)
+        generate_export.delay(export.id)
 
         self.message_user(request, f"Export task started. Export ID: {export.id}")
     export_selected_orders.short_description = "Export selected orders (Celery)"
@@ -154,22 +171,24 @@ class OrderAdmin(admin.ModelAdmin):
 
     def retry_failed_orders(self, request, queryset):
         """Retry failed orders that have been processed."""
-        orders = queryset.filter(status='failed', has_been_processed=True)
-        count = 0
-        for order in orders:
-            order.status = 'pending'
-            order.has_been_processed = False
-            order.save()
-            # Trigger processing
-            process_order.delay(order.id)
-            count += 1
-        self.message_user(request, f"{count} failed orders queued for retry.")
+        order_ids = list(
+            queryset.filter(status='failed', has_been_processed=True).values_list('id', flat=True)
+        )
+        if order_ids:
+            Order.objects.filter(id__in=order_ids).update(status='pending', has_been_processed=False)
+            # Batch tasks of 100 orders amortize broker and DB round-trips
+            group(
+                process_orders.s(order_ids[start:start + 100])
+                for start in range(0, len(order_ids), 100)
+            ).apply_async()
+        self.message_user(request, f"{len(order_ids)} failed orders queued for retry.")
     retry_failed_orders.short_description = "Retry failed orders"
 
 
 @admin.register(Export)
 class ExportAdmin(admin.ModelAdmin):
     list_display = ('id', 'requested_by', 'status', 'created_at', 'download_link')
+    list_select_related = ('requested_by', 'requested_by__user', 'requested_by__company')
     list_filter = ('status', 'requested_by__company', 'created_at')
     search_fields = ('requested_by__user__username',)
     readonly_fields = ('created_at', 'file')
@@ -185,8 +204,8 @@ class ExportAdmin(admin.ModelAdmin):
         qs = super().get_queryset(request)
         if request.user.is_superuser:
             return qs
-        if hasattr(request.user, 'profile'):
-            profile = request.user.profile
+        profile = get_profile(request)
+        if profile is not None:
             if profile.role == 'operator':
                 # Operators only see their own exports
                 return qs.filter(requested_by=profile)
@@ -213,7 +232,8 @@ class CompanyFeatureToggleAdmin(admin.ModelAdmin):
 
     def has_module_permission(self, request):
         """Hide CompanyFeatureToggle model from operators."""
-        if hasattr(request.user, 'profile') and request.user.profile.role == 'operator':
+        profile = get_profile(request)
+        if profile is not None and profile.role == 'operator':
             return False
         return super().has_module_permission(request)
 
@@ -221,6 +241,7 @@ class CompanyFeatureToggleAdmin(admin.ModelAdmin):
 @admin.register(ProductUpload)
 class ProductUploadAdmin(admin.ModelAdmin):
     list_display = ('id', 'company', 'uploaded_by', 'status', 'processed_count', 'error_count', 'created_at')
+    list_select_related = ('company', 'uploaded_by', 'uploaded_by__user')
     list_filter = ('status', 'company', 'created_at')
     search_fields = ('uploaded_by__user__username', 'company__name')
     readonly_fields = ('uploaded_by', 'company', 'status', 'processed_count', 'error_count', 'errors_log', 'created_at', 'updated_at')
@@ -231,8 +252,8 @@ class ProductUploadAdmin(admin.ModelAdmin):
         qs = super().get_queryset(request)
         if request.user.is_superuser:
             return qs
-        if hasattr(request.user, 'profile'):
-            profile = request.user.profile
+        profile = get_profile(request)
+        if profile is not None:
             if profile.role == 'operator':
                 # Operators only see their own uploads
                 return qs.filter(uploaded_by=profile)
@@ -244,9 +265,10 @@ class ProductUploadAdmin(admin.ModelAdmin):
     def save_model(self, request, obj, form, change):
         """Set uploaded_by and company, then trigger Celery task."""
         if not change:  # Only on creation
-            if hasattr(request.user, 'profile'):
-                obj.uploaded_by = request.user.profile
-                obj.company = request.user.profile.company
+            profile = get_profile(request)
+            if profile is not None:
+                obj.uploaded_by = profile
+                obj.company = profile.company
                 obj.save()
                 # Trigger Celery task
                 process_product_upload.delay(obj.id)
@@ -258,13 +280,11 @@ class ProductUploadAdmin(admin.ModelAdmin):
 
     def has_add_permission(self, request):
         """Only allow upload if user has profile and CSV upload is enabled."""
-        if not hasattr(request.user, 'profile'):
+        profile = get_profile(request)
+        if profile is None:
             return False
-        profile = request.user.profile
-        # Check if feature is enabled
-        if hasattr(profile.company, 'feature_toggle'):
-            return profile.company.feature_toggle.csv_upload_enabled
-        return True  # Default to True if no toggle exists
+        # Check if feature is enabled (cached, invalidated on toggle edits)
+        return get_feature_flags(profile.company_id).csv_upload_enabled
 
     def get_form(self, request, obj=None, **kwargs):
         """Customize form to only show file field on creation."""
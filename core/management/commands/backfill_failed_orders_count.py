@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Q
+
+from core.models import Profile
+
+
+class Command(BaseCommand):
+    help = 'Backfill Profile.failed_orders_count from existing orders'
+
+    def handle(self, *args, **options):
+        updated = 0
+        counts = Profile.objects.annotate(
+            failed=Count('orders', filter=Q(orders__status='failed'))
+        ).values_list('id', 'failed')
+        for profile_id, failed in counts:
+            updated += Profile.objects.filter(id=profile_id).exclude(
+                failed_orders_count=failed
+            ).update(failed_orders_count=failed)
+        self.stdout.write(self.style.SUCCESS(f'Updated {updated} profiles.'))
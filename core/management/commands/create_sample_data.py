@@ -1,49 +1,64 @@
 from django.core.management.base import BaseCommand
 from django.contrib.auth.models import User, Permission
 from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
 from core.models import Company, Profile, Product, Order, CompanyFeatureToggle, ProductUpload, Export
 
+# Module-level memo so repeated command runs in one process skip the lookups
+_CT_CACHE = {}
+
+
+def _content_type(model):
+    """Return the ContentType for a model, memoized across invocations."""
+    try:
+        return _CT_CACHE[model]
+    except KeyError:
+        return _CT_CACHE.setdefault(model, ContentType.objects.get_for_model(model))
+
 
 class Command(BaseCommand):
     help = 'Create sample data for testing'
 
-    def assign_permissions(self, user, role):
-        """Assign permissions based on role."""
-        models = [Company, Profile, Product, Order, Export, CompanyFeatureToggle, ProductUpload]
-        
-        for model in models:
-            content_type = ContentType.objects.get_for_model(model)
-            
-            if role == 'admin':
-                # Admins get all permissions
-                permissions = Permission.objects.filter(content_type=content_type)
-                user.user_permissions.add(*permissions)
-            elif role == 'operator':
-                # Operators get add, change, view for most models
-                perms = ['view', 'add', 'change']
-                for perm in perms:
-                    try:
-                        permission = Permission.objects.get(
-                            codename=f'{perm}_{model._meta.model_name}',
-                            content_type=content_type
-                        )
-                        user.user_permissions.add(permission)
-                    except Permission.DoesNotExist:
-                        pass
-            elif role == 'viewer':
-                # Viewers only get view permissions
-                try:
-                    permission = Permission.objects.get(
-                        codename=f'view_{model._meta.model_name}',
-                        content_type=content_type
-                    )
-                    user.user_permissions.add(permission)
-                except Permission.DoesNotExist:
-                    pass
+    MODELS = [Company, Profile, Product, Order, Export, CompanyFeatureToggle, ProductUpload]
+
+    # Permissions granted to each role
+    ROLE_ACTIONS = {
+        'admin': ['view', 'add', 'change', 'delete'],
+        'operator': ['view', 'add', 'change'],
+        'viewer': ['view'],
+    }
 
+    def build_permission_map(self):
+        """Fetch all permissions for the managed models in one query."""
+        self.content_types = {model: _content_type(model) for model in self.MODELS}
+        self.perm_map = {
+            (perm.content_type_id, perm.codename): perm
+            for perm in Permission.objects.filter(content_type__in=self.content_types.values())
+        }
+
+    def assign_permissions(self, user, role):
+        """Assign permissions based on role, using the prefetched map.
+
+        Pure dictionary lookups — no Permission query per (user, model,
+        action) combination; only the user_permissions.add() hits the DB.
+        """
+        actions = self.ROLE_ACTIONS.get(role, [])
+        permissions = []
+        for model in self.MODELS:
+            content_type_id = self.content_types[model].id
+            model_name = model._meta.model_name
+            for action in actions:
+                permission = self.perm_map.get((content_type_id, f'{action}_{model_name}'))
+                if permission is not None:
+                    permissions.append(permission)
+        user.user_permissions.add(*permissions)
+
+    @transaction.atomic
     def handle(self, *args, **options):
         self.stdout.write(self.style.SUCCESS('Creating sample data...'))
 
+        self.build_permission_map()
+
         # Create companies
         company1, _ = Company.objects.get_or_create(
             domain='acme-corp',
@@ -69,7 +84,7 @@ class Command(BaseCommand):
         )
         if created:
             admin_user.set_password('admin123')
-            admin_user.save()
+            admin_user.save(update_fields=['password'])
         
         admin_profile, _ = Profile.objects.get_or_create(
             user=admin_user,
@@ -91,11 +106,7 @@ class Command(BaseCommand):
         )
         if created:
             operator_user.set_password('operator123')
-            operator_user.save()
-        else:
-            # Update existing user to have is_staff
-            operator_user.is_staff = True
-            operator_user.save()
+            operator_user.save(update_fields=['password'])
         
         operator_profile, _ = Profile.objects.get_or_create(
             user=operator_user,
@@ -117,11 +128,7 @@ class Command(BaseCommand):
         )
         if created:
             viewer_user.set_password('viewer123')
-            viewer_user.save()
-        else:
-            # Update existing user to have is_staff
-            viewer_user.is_staff = True
-            viewer_user.save()
+            viewer_user.save(update_fields=['password'])
         
         viewer_profile, _ = Profile.objects.get_or_create(
             user=viewer_user,
@@ -145,7 +152,7 @@ class Command(BaseCommand):
         )
         if created:
             admin2_user.set_password('admin123')
-            admin2_user.save()
+            admin2_user.save(update_fields=['password'])
         
         admin2_profile, _ = Profile.objects.get_or_create(
             user=admin2_user,
@@ -155,6 +162,12 @@ class Command(BaseCommand):
         # Assign permissions
         self.assign_permissions(admin2_user, 'admin')
 
+        # Ensure pre-existing sample users can reach the admin panel;
+        # one bulk UPDATE replaces the per-user is_staff fix-ups
+        User.objects.filter(
+            username__in=['admin1', 'operator1', 'viewer1', 'admin2']
+        ).exclude(is_staff=True).update(is_staff=True)
+
         self.stdout.write(f'Created users for {company2.name}')
 
         # Create products for Company 1
@@ -164,33 +177,18 @@ class Command(BaseCommand):
             {'sku': 'ACME-003', 'name': 'Gadget X', 'stock_quantity': 75},
         ]
 
-        for prod_data in products1:
-            Product.objects.get_or_create(
-                sku=prod_data['sku'],
-                defaults={
-                    'name': prod_data['name'],
-                    'stock_quantity': prod_data['stock_quantity'],
-                    'company': company1,
-                    'is_active': True
-                }
-            )
-
         # Create products for Company 2
         products2 = [
             {'sku': 'TECH-001', 'name': 'Server Rack', 'stock_quantity': 20},
             {'sku': 'TECH-002', 'name': 'Network Switch', 'stock_quantity': 30},
         ]
 
-        for prod_data in products2:
-            Product.objects.get_or_create(
-                sku=prod_data['sku'],
-                defaults={
-                    'name': prod_data['name'],
-                    'stock_quantity': prod_data['stock_quantity'],
-                    'company': company2,
-                    'is_active': True
-                }
-            )
+        # One INSERT for all products; existing SKUs are left untouched
+        Product.objects.bulk_create(
+            [Product(company=company1, is_active=True, **prod_data) for prod_data in products1]
+            + [Product(company=company2, is_active=True, **prod_data) for prod_data in products2],
+            ignore_conflicts=True
+        )
 
         # Create feature toggles for companies
         toggle1, _ = CompanyFeatureToggle.objects.get_or_create(
@@ -216,55 +214,31 @@ class Command(BaseCommand):
         # Create orders for Company 1
         self.stdout.write('Creating sample orders...')
         
-        # Get products
-        prod1 = Product.objects.get(sku='ACME-001')
-        prod2 = Product.objects.get(sku='ACME-002')
-        prod3 = Product.objects.get(sku='ACME-003')
-        
-        # Operator 1 orders
-        orders_data = [
-            {'ref': 'ORD-OP1-001', 'prod': prod1, 'qty': 5, 'status': 'approved', 'processed': True},
-            {'ref': 'ORD-OP1-002', 'prod': prod2, 'qty': 10, 'status': 'pending', 'processed': False},
-            {'ref': 'ORD-OP1-003', 'prod': prod1, 'qty': 1000, 'status': 'failed', 'processed': True}, # Simulate failed due to stock
-        ]
-        
-        for data in orders_data:
-            Order.objects.get_or_create(
-                reference_code=data['ref'],
-                defaults={
-                    'product': data['prod'],
-                    'quantity': data['qty'],
-                    'status': data['status'],
-                    'created_by': operator_profile,
-                    'has_been_processed': data['processed']
-                }
-            )
-
-        # Admin 1 orders
-        Order.objects.get_or_create(
-            reference_code='ORD-ADM1-001',
-            defaults={
-                'product': prod3,
-                'quantity': 2,
-                'status': 'processing',
-                'created_by': admin_profile,
-                'has_been_processed': False
-            }
-        )
-
-        # Create orders for Company 2
-        prod_tech1 = Product.objects.get(sku='TECH-001')
-        
-        Order.objects.get_or_create(
-            reference_code='ORD-ADM2-001',
-            defaults={
-                'product': prod_tech1,
-                'quantity': 1,
-                'status': 'approved',
-                'created_by': admin2_profile,
-                'has_been_processed': True
-            }
+        # Recover the seeded products in one query, keyed by SKU
+        products = Product.objects.in_bulk(
+            ['ACME-001', 'ACME-002', 'ACME-003', 'TECH-001'], field_name='sku'
         )
+        prod1 = products['ACME-001']
+        prod2 = products['ACME-002']
+        prod3 = products['ACME-003']
+        prod_tech1 = products['TECH-001']
+
+        # Operator 1, Admin 1 and Company 2 orders in one INSERT;
+        # existing reference codes are left untouched
+        orders = [
+            Order(reference_code='ORD-OP1-001', product=prod1, quantity=5,
+                  status='approved', created_by=operator_profile, has_been_processed=True),
+            Order(reference_code='ORD-OP1-002', product=prod2, quantity=10,
+                  status='pending', created_by=operator_profile, has_been_processed=False),
+            # Simulate failed due to stock
+            Order(reference_code='ORD-OP1-003', product=prod1, quantity=1000,
+                  status='failed', created_by=operator_profile, has_been_processed=True),
+            Order(reference_code='ORD-ADM1-001', product=prod3, quantity=2,
+                  status='processing', created_by=admin_profile, has_been_processed=False),
+            Order(reference_code='ORD-ADM2-001', product=prod_tech1, quantity=1,
+                  status='approved', created_by=admin2_profile, has_been_processed=True),
+        ]
+        Order.objects.bulk_create(orders, ignore_conflicts=True)
 
         self.stdout.write(self.style.SUCCESS('Sample data created successfully!'))
         self.stdout.write('\nSample credentials:')
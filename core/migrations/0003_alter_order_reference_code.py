@@ -0,0 +1,37 @@
+# Generated by Django 4.2.30 on 2026-08-28 10:08
+
+import core.models
+from django.db import migrations, models
+
+
+def set_db_default(apps, schema_editor):
+    # Postgres-only column DEFAULT so raw multi-row inserts can omit the
+    # reference code entirely; the ORM keeps using the Python default.
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            "ALTER TABLE core_order ALTER COLUMN reference_code "
+            "SET DEFAULT ('ORD-' || upper(substr(md5(random()::text), 1, 8)))"
+        )
+
+
+def drop_db_default(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            "ALTER TABLE core_order ALTER COLUMN reference_code DROP DEFAULT"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_productupload_companyfeaturetoggle'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='order',
+            name='reference_code',
+            field=models.CharField(default=core.models.generate_reference_code, max_length=100, unique=True),
+        ),
+        migrations.RunPython(set_db_default, drop_db_default),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.30 on 2026-08-28 10:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_alter_order_reference_code'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='export',
+            index=models.Index(fields=['requested_by', '-created_at'], name='core_export_request_8505fc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', 'has_been_processed'], name='core_order_status_12c490_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['created_by', '-created_at'], name='core_order_created_07d029_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['product', 'status'], name='core_order_product_da06dc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productupload',
+            index=models.Index(fields=['company', '-created_at'], name='core_produc_company_c6f7cd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(fields=['company', 'role', 'is_blocked'], name='core_profil_company_f636dd_idx'),
+        ),
+    ]
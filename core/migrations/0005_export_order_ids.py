@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-08-28 10:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_export_core_export_request_8505fc_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='export',
+            name='order_ids',
+            field=models.JSONField(blank=True, default=list, help_text='IDs of the orders included in this export'),
+        ),
+    ]
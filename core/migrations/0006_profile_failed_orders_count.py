@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-08-28 10:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_export_order_ids'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='failed_orders_count',
+            field=models.PositiveIntegerField(db_index=True, default=0, help_text="Running count of this profile's failed orders"),
+        ),
+    ]
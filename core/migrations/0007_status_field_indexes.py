@@ -0,0 +1,42 @@
+# Generated by Django 4.2.30 on 2026-08-28 10:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_profile_failed_orders_count'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='export',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')], db_index=True, default='pending', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='has_been_processed',
+            field=models.BooleanField(db_index=True, default=False, help_text='Whether this order has gone through processing'),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('approved', 'Approved'), ('failed', 'Failed')], db_index=True, default='pending', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='productupload',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('completed', 'Completed'), ('failed', 'Failed')], db_index=True, default='pending', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='profile',
+            name='role',
+            field=models.CharField(choices=[('admin', 'Admin'), ('operator', 'Operator'), ('viewer', 'Viewer')], db_index=True, default='viewer', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['status'], name='order_pending_idx'),
+        ),
+    ]
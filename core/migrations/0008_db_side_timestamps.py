@@ -0,0 +1,107 @@
+# Generated by Django 4.2.30 on 2026-08-28 10:24
+
+from django.db import migrations, models
+import django.utils.timezone
+
+# Tables with a created_at column that should default to now() in the DB
+_CREATED_AT_TABLES = [
+    'core_company',
+    'core_companyfeaturetoggle',
+    'core_export',
+    'core_order',
+    'core_product',
+    'core_productupload',
+    'core_profile',
+]
+
+# Tables with an updated_at column maintained by a trigger, so queryset
+# update() calls (which skip auto_now) still touch it
+_UPDATED_AT_TABLES = [
+    'core_company',
+    'core_companyfeaturetoggle',
+    'core_order',
+    'core_product',
+    'core_productupload',
+    'core_profile',
+]
+
+
+def add_db_timestamps(apps, schema_editor):
+    # Postgres-only: raw inserts can omit created_at, and updated_at stays
+    # correct even for bulk UPDATEs; the ORM keeps its Python-side values.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table in _CREATED_AT_TABLES:
+        schema_editor.execute(
+            f"ALTER TABLE {table} ALTER COLUMN created_at SET DEFAULT now()"
+        )
+    schema_editor.execute(
+        "CREATE OR REPLACE FUNCTION core_touch_updated_at() RETURNS trigger AS $$ "
+        "BEGIN NEW.updated_at := now(); RETURN NEW; END; "
+        "$$ LANGUAGE plpgsql"
+    )
+    for table in _UPDATED_AT_TABLES:
+        schema_editor.execute(
+            f"CREATE TRIGGER {table}_touch_updated_at BEFORE UPDATE ON {table} "
+            "FOR EACH ROW EXECUTE FUNCTION core_touch_updated_at()"
+        )
+
+
+def drop_db_timestamps(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table in _UPDATED_AT_TABLES:
+        schema_editor.execute(
+            f"DROP TRIGGER IF EXISTS {table}_touch_updated_at ON {table}"
+        )
+    schema_editor.execute("DROP FUNCTION IF EXISTS core_touch_updated_at()")
+    for table in _CREATED_AT_TABLES:
+        schema_editor.execute(
+            f"ALTER TABLE {table} ALTER COLUMN created_at DROP DEFAULT"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_status_field_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='company',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='companyfeaturetoggle',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='export',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='productupload',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='profile',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.RunPython(add_db_timestamps, drop_db_timestamps),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-08-28 10:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_db_side_timestamps'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='product',
+            constraint=models.CheckConstraint(check=models.Q(('stock_quantity__gte', 0)), name='product_stock_non_negative'),
+        ),
+    ]
@@ -1,8 +1,16 @@
+from secrets import token_hex
+
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 from django.core.validators import MinValueValidator
 
 
+def generate_reference_code():
+    """Default reference code for orders, e.g. ORD-1A2B3C4D."""
+    return f"ORD-{token_hex(4).upper()}"
+
+
 class Company(models.Model):
     """
     Represents a company in the multi-tenant system.
@@ -10,7 +18,7 @@ class Company(models.Model):
     name = models.CharField(max_length=255)
     domain = models.CharField(max_length=255, unique=True, help_text="Unique domain identifier for multi-tenancy")
     is_active = models.BooleanField(default=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
@@ -21,6 +29,12 @@ class Company(models.Model):
         return self.name
 
 
+class ProfileManager(models.Manager):
+    """Joins the user/company rows that __str__ and admin widgets render."""
+    def get_queryset(self):
+        return super().get_queryset().select_related('user', 'company')
+
+
 class Profile(models.Model):
     """
     User profile linked to a company with role-based access.
@@ -33,11 +47,19 @@ class Profile(models.Model):
 
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
     company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='profiles')
-    role = models.CharField(max_length=20, choices=ROLE_CHOICES, default='viewer')
+    role = models.CharField(max_length=20, choices=ROLE_CHOICES, default='viewer', db_index=True)
     is_blocked = models.BooleanField(default=False, help_text="Whether the user is blocked from accessing the system")
-    created_at = models.DateTimeField(auto_now_add=True)
+    failed_orders_count = models.PositiveIntegerField(default=0, db_index=True, help_text="Running count of this profile's failed orders")
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ProfileManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['company', 'role', 'is_blocked']),
+        ]
+
     def __str__(self):
         return f"{self.user.username} - {self.company.name} ({self.role})"
 
@@ -51,16 +73,27 @@ class Product(models.Model):
     stock_quantity = models.IntegerField(default=0, validators=[MinValueValidator(0)])
     company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='products')
     is_active = models.BooleanField(default=True, help_text="Whether the product is available for ordering")
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['name']
+        constraints = [
+            # Backs MinValueValidator at the DB level so bulk upserts
+            # can't slip negative stock past the Python validators
+            models.CheckConstraint(check=models.Q(stock_quantity__gte=0), name='product_stock_non_negative'),
+        ]
 
     def __str__(self):
         return f"{self.sku} - {self.name}"
 
 
+class OrderManager(models.Manager):
+    """Joins the product/creator rows that __str__ and admin widgets render."""
+    def get_queryset(self):
+        return super().get_queryset().select_related('product', 'created_by__user')
+
+
 class Order(models.Model):
     """
     Order placed by users for products.
@@ -72,22 +105,45 @@ class Order(models.Model):
         ('failed', 'Failed'),
     ]
 
-    reference_code = models.CharField(max_length=100, unique=True)
+    reference_code = models.CharField(max_length=100, unique=True, default=generate_reference_code)
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='orders')
     quantity = models.IntegerField(validators=[MinValueValidator(1)])
-    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', db_index=True)
     created_by = models.ForeignKey('Profile', on_delete=models.CASCADE, related_name='orders')
-    has_been_processed = models.BooleanField(default=False, help_text="Whether this order has gone through processing")
-    created_at = models.DateTimeField(auto_now_add=True)
+    has_been_processed = models.BooleanField(default=False, db_index=True, help_text="Whether this order has gone through processing")
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = OrderManager()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the persisted status so signals can detect transitions
+        if 'status' in field_names:
+            instance._loaded_status = instance.status
+        return instance
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'has_been_processed']),
+            models.Index(fields=['created_by', '-created_at']),
+            models.Index(fields=['product', 'status']),
+            # Partial index for the hot "list pending orders" admin filter
+            models.Index(fields=['status'], condition=models.Q(status='pending'), name='order_pending_idx'),
+        ]
 
     def __str__(self):
         return f"{self.reference_code} - {self.product.name} ({self.status})"
 
 
+class ExportManager(models.Manager):
+    """Joins the requesting user that __str__ renders."""
+    def get_queryset(self):
+        return super().get_queryset().select_related('requested_by__user')
+
+
 class Export(models.Model):
     """
     Export requests for order data.
@@ -99,13 +155,19 @@ class Export(models.Model):
     ]
 
     requested_by = models.ForeignKey('Profile', on_delete=models.CASCADE, related_name='exports')
-    created_at = models.DateTimeField(auto_now_add=True)
-    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', db_index=True)
     file = models.FileField(upload_to='exports/', null=True, blank=True)
     note = models.TextField(blank=True, help_text="Optional comments related to the export")
+    order_ids = models.JSONField(default=list, blank=True, help_text="IDs of the orders included in this export")
+
+    objects = ExportManager()
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['requested_by', '-created_at']),
+        ]
 
     def __str__(self):
         return f"Export {self.id} by {self.requested_by.user.username} - {self.status}"
@@ -120,7 +182,7 @@ class CompanyFeatureToggle(models.Model):
     exports_enabled = models.BooleanField(default=True, help_text="Allow order exports")
     api_access_enabled = models.BooleanField(default=True, help_text="Allow API access")
     csv_upload_enabled = models.BooleanField(default=True, help_text="Allow CSV product uploads")
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
@@ -131,6 +193,12 @@ class CompanyFeatureToggle(models.Model):
         return f"Feature Toggles for {self.company.name}"
 
 
+class ProductUploadManager(models.Manager):
+    """Joins the uploading user that __str__ renders."""
+    def get_queryset(self):
+        return super().get_queryset().select_related('uploaded_by__user')
+
+
 class ProductUpload(models.Model):
     """
     Track CSV product upload history.
@@ -145,17 +213,22 @@ class ProductUpload(models.Model):
     company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='product_uploads')
     file = models.FileField(upload_to='product_uploads/')
     uploaded_by = models.ForeignKey('Profile', on_delete=models.CASCADE, related_name='product_uploads')
-    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', db_index=True)
     processed_count = models.IntegerField(default=0, help_text="Number of products successfully processed")
     error_count = models.IntegerField(default=0, help_text="Number of rows with errors")
     errors_log = models.TextField(blank=True, help_text="Log of errors encountered during processing")
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ProductUploadManager()
+
     class Meta:
         ordering = ['-created_at']
         verbose_name = "Product Upload"
         verbose_name_plural = "Product Uploads"
+        indexes = [
+            models.Index(fields=['company', '-created_at']),
+        ]
 
     def __str__(self):
         return f"Upload {self.id} by {self.uploaded_by.user.username} - {self.status}"
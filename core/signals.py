@@ -0,0 +1,29 @@
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Company, CompanyFeatureToggle, Order, Profile
+
+
+@receiver(post_save, sender=Company)
+def create_company_feature_toggle(sender, instance, created, **kwargs):
+    """Ensure every company gets a feature toggle row at creation time."""
+    if created:
+        CompanyFeatureToggle.objects.get_or_create(company=instance)
+
+
+@receiver([post_save, post_delete], sender=CompanyFeatureToggle)
+def invalidate_feature_flags_cache(sender, instance, **kwargs):
+    """Keep the cached feature flags in sync with toggle edits."""
+    from .utils import invalidate_feature_flags
+    invalidate_feature_flags(instance.company_id)
+
+
+@receiver(post_save, sender=Order)
+def count_failed_order(sender, instance, **kwargs):
+    """Bump the creator's failed-order counter when an order transitions to failed."""
+    if instance.status == 'failed' and getattr(instance, '_loaded_status', None) != 'failed':
+        Profile.objects.filter(id=instance.created_by_id).update(
+            failed_orders_count=F('failed_orders_count') + 1
+        )
+    instance._loaded_status = instance.status
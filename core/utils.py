@@ -0,0 +1,63 @@
+from collections import namedtuple
+
+from django.core.cache import cache
+
+from .models import CompanyFeatureToggle, Profile
+
+_UNSET = object()
+
+# Lightweight cached view of a CompanyFeatureToggle row.
+_FeatureFlags = namedtuple(
+    '_FeatureFlags',
+    ['bulk_orders_enabled', 'exports_enabled', 'api_access_enabled', 'csv_upload_enabled'],
+)
+
+FEATURE_FLAGS_CACHE_TIMEOUT = 60
+
+
+def _load_feature_flags(company_id):
+    toggle, _ = CompanyFeatureToggle.objects.get_or_create(company_id=company_id)
+    return _FeatureFlags(
+        toggle.bulk_orders_enabled,
+        toggle.exports_enabled,
+        toggle.api_access_enabled,
+        toggle.csv_upload_enabled,
+    )
+
+
+def get_feature_flags(company_id):
+    """Return the cached feature flags for a company."""
+    return cache.get_or_set(
+        f'feature_flags:{company_id}',
+        lambda: _load_feature_flags(company_id),
+        FEATURE_FLAGS_CACHE_TIMEOUT,
+    )
+
+
+def invalidate_feature_flags(company_id):
+    """Drop the cached flags for a company after its toggle row changes."""
+    cache.delete(f'feature_flags:{company_id}')
+
+
+def get_profile(request):
+    """
+    Return the requesting user's profile (or None), cached on the request.
+
+    API permissions, admin hooks, get_queryset and serializer validation
+    all need the profile — and the admin calls its hooks several times
+    per page. Caching the result on the request means the reverse
+    one-to-one is resolved at most once per request, with the company
+    and its feature toggle joined in the same query. filter().first()
+    also sidesteps the exception-raising path of the reverse one-to-one
+    descriptor that hasattr(user, 'profile') probes go through.
+    """
+    profile = getattr(request, '_profile_cache', _UNSET)
+    if profile is _UNSET:
+        user = request.user
+        profile = None
+        if getattr(user, 'is_authenticated', False):
+            profile = Profile.objects.select_related(
+                'company', 'company__feature_toggle'
+            ).filter(user_id=user.id).first()
+        request._profile_cache = profile
+    return profile
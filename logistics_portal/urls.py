@@ -22,6 +22,14 @@ from django.http import JsonResponse
 from django.db import connection
 from redis import Redis
 
+# Shared, pooled client: liveness probes hit /health/ every few seconds
+# and reconnecting per request churns sockets for no benefit
+_redis_client = Redis.from_url(
+    settings.CELERY_BROKER_URL,
+    socket_connect_timeout=0.5,
+    socket_timeout=0.5,
+)
+
 
 def health_check(request):
     """Health check endpoint to verify DB, Redis, and Celery."""
@@ -42,8 +50,7 @@ def health_check(request):
     
     # Check Redis
     try:
-        redis_client = Redis.from_url(settings.CELERY_BROKER_URL)
-        redis_client.ping()
+        _redis_client.ping()
         health_status['redis'] = 'connected'
     except Exception as e:
         health_status['redis'] = f'error: {str(e)}'